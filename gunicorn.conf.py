@@ -0,0 +1,30 @@
+# Gunicorn settings for running SafetyMapper in production:
+#   gunicorn safetymapper:app
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+
+# Each worker process imports safetymapper itself, so it gets its own Firestore,
+# Maps and Gemini clients and thread pool. Do not preload: the gRPC-based
+# Firestore client is not safe to share across fork().
+preload_app = False
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+
+# Requests mostly wait on Google APIs, so several threads per worker keep the CPU busy
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', '8'))
+
+
+def post_worker_init(worker):
+    # __main__ does not run under gunicorn, so seed sample data and warm this
+    # worker's Firestore connection and incident cache here, off the request path
+    import safetymapper
+    safetymapper.maps_executor.submit(safetymapper.warm_up_services)
+
+
+def worker_exit(server, worker):
+    # Write queued incident reports and logs before a recycled or stopped worker goes away
+    import safetymapper
+    safetymapper.incident_writer.flush()
+    safetymapper.log_writer.flush()
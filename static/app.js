@@ -0,0 +1,1592 @@
+let map;
+let clickMarker = null;
+let safetyMarkers = [];
+let routePolylines = [];
+let heatmap;
+let directionsService;
+let geocoder;
+let directionsRenderer;
+let currentView = 'incidents';
+let selectedIncidentType = '';
+let selectedLocation = null;
+let autocompleteObjects = {};
+let currentRoute = null;
+let currentRouteSegments = null;
+let chatHistory = [];
+let isChatOpen = false;
+let chatInFlight = false;
+let selectedPhoto = null;
+let segmentInfoTemplate = null;
+let segmentInfoWindow = null;
+let markerInfoWindow = null;
+let incidentMarkers = null;
+let incidentMarkersPromise = null;
+let heatmapPromise = null;
+let incidentClusterer = null;
+let safetyTimer = null;
+let safetyAbort = null;
+
+// Places autocomplete starts suggesting after this many characters
+const AUTOCOMPLETE_MIN_CHARS = 3;
+
+// Number of incidents shown in the sidebar's recent list
+const RECENT_INCIDENTS_LIMIT = 5;
+
+// Quiet period after the map goes idle before safety resources are fetched
+const SAFETY_RESOURCES_DEBOUNCE_MS = 300;
+
+// Safety resource responses kept per grid cell, least recently used first
+const SAFETY_CACHE_MAX_ENTRIES = 64;
+const safetyResourceCache = new Map();
+
+// Route segment stroke styles by safety level
+const SEGMENT_STYLES = Object.freeze({
+    high_risk: { color: '#dc2626', weight: 8 },
+    medium_risk: { color: '#ea580c', weight: 6 },
+    low_risk: { color: '#65a30d', weight: 4 },
+    _default: { color: '#2563eb', weight: 4 }
+});
+
+// Decode a Google encoded polyline string into [lat, lng] pairs
+function decodeCoordinates(encoded) {
+    const points = [];
+    let index = 0, lat = 0, lng = 0;
+    while (index < encoded.length) {
+        for (let axis = 0; axis < 2; axis++) {
+            let result = 0, shift = 0, byte;
+            do {
+                byte = encoded.charCodeAt(index++) - 63;
+                result |= (byte & 0x1f) << shift;
+                shift += 5;
+            } while (byte >= 0x20);
+            const delta = (result & 1) ? ~(result >> 1) : (result >> 1);
+            if (axis === 0) lat += delta; else lng += delta;
+        }
+        points.push([lat / 1e5, lng / 1e5]);
+    }
+    return points;
+}
+
+// Load incidents from backend (embedded by the page template, coordinates as one encoded string)
+const incidents = window.SAFETYMAPPER_INCIDENTS || [];
+decodeCoordinates(window.SAFETYMAPPER_INCIDENT_COORDS || '').forEach(([lat, lng], i) => {
+    incidents[i].lat = lat;
+    incidents[i].lng = lng;
+});
+const incidentById = new Map(incidents.map(incident => [incident.id, incident]));
+
+// Marker icon data URIs and sizes, built once per color/emoji/size
+const ICON_CACHE = {};
+const ICON_SIZES = {};
+const MARKER_SHAPES = Object.freeze({
+    24: { radius: 10, stroke: 2, textY: 16 },
+    32: { radius: 12, stroke: 3, textY: 20 }
+});
+console.log(`🔥 Loaded ${incidents.length} incidents`);
+
+// Enhanced Chat Functions
+function toggleChat() {
+    const modal = document.getElementById('chatModal');
+    const fab = document.getElementById('chatFab');
+    const badge = document.getElementById('chatBadge');
+    
+    if (isChatOpen) {
+        modal.classList.add('closing');
+        fab.classList.remove('chat-open');
+        fab.innerHTML = '🤖<div class="chat-badge" id="chatBadge" style="display: none;">!</div>';
+        setTimeout(() => {
+            modal.style.display = 'none';
+            modal.classList.remove('closing');
+        }, 300);
+        isChatOpen = false;
+    } else {
+        modal.style.display = 'flex';
+        fab.classList.add('chat-open');
+        fab.innerHTML = '✕';
+        isChatOpen = true;
+        if (badge) badge.style.display = 'none';
+        
+        setTimeout(() => {
+            document.getElementById('chatInput').focus();
+        }, 100);
+    }
+}
+
+function handleChatKeyPress(event) {
+    if (event.key === 'Enter' && !event.shiftKey) {
+        event.preventDefault();
+        if (chatInFlight) return;
+        sendChatMessage();
+    }
+}
+
+async function sendChatMessage() {
+    if (chatInFlight) return;
+    
+    const input = document.getElementById('chatInput');
+    const message = input.value.trim();
+    
+    if (!message) return;
+    
+    if (message.length > 500) {
+        addChatMessage('Message too long. Please keep messages under 500 characters.', 'system');
+        return;
+    }
+    
+    chatInFlight = true;
+    addChatMessage(message, 'user');
+    input.value = '';
+    
+    const sendBtn = document.getElementById('chatSend');
+    const aiThinking = document.getElementById('aiThinking');
+    
+    sendBtn.disabled = true;
+    input.disabled = true;
+    aiThinking.style.display = 'block';
+    
+    // The timeout covers the wait for the first fragment; a reply that is already streaming is left to finish
+    const controller = new AbortController();
+    const timeout = setTimeout(() => controller.abort(), 15000);
+    let reply = null;
+    let replyHtml = '';
+    
+    try {
+        const response = await getAIResponse(message, controller.signal, fragment => {
+            clearTimeout(timeout);
+            replyHtml += fragment;
+            if (!reply) {
+                aiThinking.style.display = 'none';
+                reply = addChatMessage(replyHtml, 'ai');
+            } else {
+                reply.element.innerHTML = replyHtml;
+                reply.entry.message = replyHtml.replace(/<[^>]*>/g, '');
+            }
+            scheduleChatScroll();
+        });
+        
+        if (!reply) {
+            addChatMessage(response, 'ai');
+        }
+        
+    } catch (error) {
+        console.error('AI response error:', error);
+        
+        let errorMessage;
+        if (error.name === 'AbortError') {
+            errorMessage = 'Response took too long. Please try a simpler question.';
+        } else {
+            errorMessage = 'Sorry, I encountered an error. Please try again.';
+        }
+        
+        addChatMessage(errorMessage, 'system');
+    } finally {
+        clearTimeout(timeout);
+        chatInFlight = false;
+        sendBtn.disabled = false;
+        input.disabled = false;
+        aiThinking.style.display = 'none';
+        
+        scheduleChatScroll();
+        input.focus();
+    }
+}
+
+// Scroll the chat to the bottom at most once per frame
+let chatScrollPending = false;
+
+function scheduleChatScroll() {
+    if (chatScrollPending) return;
+    chatScrollPending = true;
+    requestAnimationFrame(() => {
+        chatScrollPending = false;
+        const chatMessages = document.getElementById('chatMessages');
+        chatMessages.scrollTop = chatMessages.scrollHeight;
+    });
+}
+
+function addChatMessage(message, sender) {
+    const chatMessages = document.getElementById('chatMessages');
+    const messageDiv = document.createElement('div');
+    messageDiv.className = `chat-message ${sender}`;
+    
+    if (sender === 'ai') {
+        messageDiv.innerHTML = message;
+    } else if (sender === 'system') {
+        messageDiv.innerHTML = `⚠️ ${message}`;
+        messageDiv.style.background = '#fff3cd';
+        messageDiv.style.border = '1px solid #ffc107';
+        messageDiv.style.color = '#856404';
+    } else {
+        messageDiv.textContent = message;
+    }
+    
+    chatMessages.appendChild(messageDiv);
+    
+    const entry = { 
+        message: sender === 'user' ? message : message.replace(/<[^>]*>/g, ''), 
+        sender, 
+        timestamp: new Date() 
+    };
+    chatHistory.push(entry);
+    
+    if (chatHistory.length > 50) {
+        chatHistory = chatHistory.slice(-50);
+    }
+    
+    scheduleChatScroll();
+    
+    return { element: messageDiv, entry };
+}
+
+async function getAIResponse(userMessage, signal, onFragment) {
+    try {
+        const response = await fetch('/api/ai-chat', {
+            method: 'POST',
+            headers: { 
+                'Content-Type': 'application/json',
+                'Accept': 'text/event-stream, application/json'
+            },
+            body: JSON.stringify({ 
+                message: userMessage.substring(0, 500)
+            }),
+            signal
+        });
+        
+        if (!response.ok) {
+            throw new Error(`HTTP ${response.status}: ${response.statusText}`);
+        }
+        
+        if ((response.headers.get('Content-Type') || '').startsWith('text/event-stream')) {
+            return await readChatStream(response, onFragment);
+        }
+        
+        const data = await response.json();
+        
+        if (data.response) {
+            return data.response;
+        } else if (data.error) {
+            throw new Error(data.error);
+        } else {
+            throw new Error('Invalid response format');
+        }
+        
+    } catch (error) {
+        console.error('AI request failed:', error);
+        throw error;
+    }
+}
+
+async function readChatStream(response, onFragment) {
+    // Each Server-Sent Event carries one HTML fragment of the reply
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let html = '';
+    
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        
+        buffer += decoder.decode(value, { stream: true });
+        const events = buffer.split('\n\n');
+        buffer = events.pop();
+        
+        for (const event of events) {
+            if (event.startsWith('event: done')) {
+                return html;
+            }
+            if (event.startsWith('data: ')) {
+                const fragment = JSON.parse(event.slice(6)).html;
+                html += fragment;
+                onFragment(fragment);
+            }
+        }
+    }
+    
+    if (!html) {
+        throw new Error('Invalid response format');
+    }
+    return html;
+}
+
+function initializeChat() {
+    const chatMessages = document.getElementById('chatMessages');
+    chatMessages.innerHTML = '';
+    
+    const welcomeMessage = `
+        <div style="background: #e8f4fd; padding: 12px; border-radius: 8px; border-left: 4px solid #2196F3; margin-bottom: 8px;">
+        <strong>🤖 SafetyMapper AI Assistant</strong><br>
+        <small>Powered by Vertex AI Safety + Google Gemini</small>
+        </div>
+        
+        I can help you with safety questions about your area.<br><br>
+        
+        <strong>Try asking:</strong><br>
+        • "Is it safe to walk downtown at night?"<br>
+        • "What recent incidents happened?"<br>
+        • "How safe is my area?"<br>
+        • "What areas should I avoid?"<br><br>
+        
+        <small>💡 I analyze real local incident data to give you personalized safety advice.</small>
+    `;
+    
+    addChatMessage(welcomeMessage, 'ai');
+    
+    const badge = document.getElementById('chatBadge');
+    if (badge && chatHistory.length === 0) {
+        badge.style.display = 'flex';
+        badge.textContent = '!';
+    }
+}
+
+function initMap() {
+    console.log('🗺️ SafetyMapper with Firestore + AI initialized');
+    
+    try {
+        map = new google.maps.Map(document.getElementById('map'), {
+            zoom: 11,
+            center: { lat: 38.9847, lng: -77.0947 },
+            styles: [
+                {
+                    featureType: 'all',
+                    elementType: 'geometry.fill',
+                    stylers: [{ weight: '2.00' }]
+                },
+                {
+                    featureType: 'all',
+                    elementType: 'geometry.stroke',
+                    stylers: [{ color: '#9c9c9c' }]
+                }
+            ]
+        });
+
+        directionsService = new google.maps.DirectionsService();
+        geocoder = new google.maps.Geocoder();
+        directionsRenderer = new google.maps.DirectionsRenderer({
+            draggable: true
+        });
+        directionsRenderer.setMap(map);
+
+        map.addListener('click', function(event) {
+            selectLocation(event.latLng);
+        });
+
+        map.addListener('idle', function() {
+            if (currentView === 'safety' || currentView === 'all') {
+                loadSafetyResources();
+            }
+        });
+
+        initializeAutocomplete();
+        showIncidents();
+        updateRecentIncidentsList();
+        
+        console.log('🎉 SafetyMapper with AI ready!')
+
+    } catch (error) {
+        console.error('❌ SafetyMapper initialization failed:', error);
+    }
+}
+
+function selectLocation(latLng) {
+    selectedLocation = latLng;
+    
+    reverseGeocode(latLng).then(address => {
+        // Ignore answers for a point the user has already clicked away from
+        if (address && selectedLocation === latLng) {
+            document.getElementById('location').value = address;
+        }
+    });
+
+    // A single pin marks the clicked point; later clicks move it
+    if (clickMarker) {
+        clickMarker.setPosition(latLng);
+        clickMarker.setAnimation(google.maps.Animation.DROP);
+        clickMarker.setMap(map);
+    } else {
+        clickMarker = new google.maps.Marker({
+            position: latLng,
+            map: map,
+            icon: getMarkerIcon('#667eea', '📍', 32, 14),
+            animation: google.maps.Animation.DROP
+        });
+    }
+}
+
+function clearClickMarker() {
+    if (clickMarker) {
+        clickMarker.setMap(null);
+    }
+}
+
+// Reverse geocodes for the same point share one request while it is in flight and briefly afterwards
+const REVERSE_GEOCODE_REUSE_MS = 500;
+const reverseGeocodeRequests = new Map();
+
+function reverseGeocode(latLng) {
+    const key = latLng.toUrlValue();
+    let request = reverseGeocodeRequests.get(key);
+    if (!request) {
+        request = geocoder.geocode({ location: latLng })
+            .then(({ results }) => results[0] ? results[0].formatted_address : null)
+            .catch(() => null)
+            .finally(() => setTimeout(() => reverseGeocodeRequests.delete(key), REVERSE_GEOCODE_REUSE_MS));
+        reverseGeocodeRequests.set(key, request);
+    }
+    return request;
+}
+
+function loadSafetyResources() {
+    // Wait for panning to settle and drop any request a newer viewport has superseded
+    clearTimeout(safetyTimer);
+    if (safetyAbort) {
+        safetyAbort.abort();
+        safetyAbort = null;
+    }
+    
+    const zoom = map.getZoom();
+    if (zoom < 12) {
+        clearSafetyMarkers();
+        return;
+    }
+    
+    const tile = getSafetyTile(map.getCenter(), zoom);
+    const cached = safetyResourceCache.get(tile.key);
+    if (cached) {
+        // Move to the most recently used end
+        safetyResourceCache.delete(tile.key);
+        safetyResourceCache.set(tile.key, cached);
+        renderSafetyResources(cached);
+        return;
+    }
+    
+    safetyTimer = setTimeout(() => fetchSafetyResources(tile, zoom), SAFETY_RESOURCES_DEBOUNCE_MS);
+}
+
+function getSafetyTile(center, zoom) {
+    // Snap the viewport center to a grid cell a quarter the size of a map tile at this zoom
+    const scale = 2 ** (zoom + 2);
+    const x = Math.floor((center.lng() + 180) * scale / 360);
+    const y = Math.floor((center.lat() + 90) * scale / 180);
+    return {
+        key: `${zoom}/${x}/${y}`,
+        lat: (y + 0.5) * 180 / scale - 90,
+        lng: (x + 0.5) * 360 / scale - 180
+    };
+}
+
+function renderSafetyResources(data) {
+    if (currentView === 'safety' || currentView === 'all') {
+        clearSafetyMarkers();
+        displaySafetyResources(data.police_stations, data.hospitals);
+    }
+}
+
+async function fetchSafetyResources(tile, zoom) {
+    const controller = new AbortController();
+    safetyAbort = controller;
+    
+    try {
+        // Every viewport in the same cell queries the cell center, so its response can be reused
+        const lat = tile.lat.toFixed(5);
+        const lng = tile.lng.toFixed(5);
+        const response = await fetch(`/api/safety-resources?lat=${lat}&lng=${lng}&zoom=${zoom}`,
+                                     { signal: controller.signal });
+        const data = await response.json();
+        
+        if (response.ok) {
+            safetyResourceCache.set(tile.key, data);
+            if (safetyResourceCache.size > SAFETY_CACHE_MAX_ENTRIES) {
+                safetyResourceCache.delete(safetyResourceCache.keys().next().value);
+            }
+            renderSafetyResources(data);
+        }
+    } catch (error) {
+        if (error.name !== 'AbortError') {
+            console.error('❌ Error loading safety resources:', error);
+        }
+    } finally {
+        if (safetyAbort === controller) {
+            safetyAbort = null;
+        }
+    }
+}
+
+function displaySafetyResources(policeStations, hospitals) {
+    policeStations.forEach(station => {
+        const marker = new google.maps.Marker({
+            position: { lat: station.lat, lng: station.lng },
+            map: map,
+            icon: getMarkerIcon('#1e40af', '🚔', 24, 10),
+            title: station.name
+        });
+
+        marker.addListener('click', () => {
+            openMarkerInfoWindow(marker, `
+                <div style="padding: 8px;">
+                    <h4 style="margin: 0 0 4px 0; color: #1e40af;">🚔 ${station.name}</h4>
+                    <p style="margin: 0; font-size: 0.9em; color: #666;">${station.address}</p>
+                </div>
+            `);
+        });
+        
+        safetyMarkers.push(marker);
+    });
+    
+    hospitals.forEach(hospital => {
+        const marker = new google.maps.Marker({
+            position: { lat: hospital.lat, lng: hospital.lng },
+            map: map,
+            icon: getMarkerIcon('#dc2626', '🏥', 24, 10),
+            title: hospital.name
+        });
+
+        marker.addListener('click', () => {
+            openMarkerInfoWindow(marker, `
+                <div style="padding: 8px;">
+                    <h4 style="margin: 0 0 4px 0; color: #dc2626;">🏥 ${hospital.name}</h4>
+                    <p style="margin: 0; font-size: 0.9em; color: #666;">${hospital.address}</p>
+                </div>
+            `);
+        });
+        
+        safetyMarkers.push(marker);
+    });
+}
+
+// One InfoWindow is shared by every incident and safety resource marker
+function openMarkerInfoWindow(marker, content) {
+    if (!markerInfoWindow) {
+        markerInfoWindow = new google.maps.InfoWindow();
+    }
+    markerInfoWindow.setContent(content);
+    markerInfoWindow.open(map, marker);
+}
+
+function clearSafetyMarkers() {
+    safetyMarkers.forEach(marker => marker.setMap(null));
+    safetyMarkers = [];
+}
+
+function clearMarkers() {
+    // Incident markers and the heatmap are hidden, not destroyed, so switching views can reuse them
+    setIncidentsVisible(false);
+    setHeatmapVisible(false);
+}
+
+function setIncidentsVisible(visible) {
+    if (!incidentMarkers) return;
+    if (incidentClusterer) {
+        incidentClusterer.setMap(visible ? map : null);
+    } else {
+        incidentMarkers.forEach(marker => marker.setMap(visible ? map : null));
+    }
+}
+
+function setHeatmapVisible(visible) {
+    if (heatmap) {
+        heatmap.setMap(visible ? map : null);
+    }
+}
+
+function resetIncidentLayers() {
+    // Drop the built layers after the incident list changes so the next show rebuilds them
+    setIncidentsVisible(false);
+    setHeatmapVisible(false);
+    incidentArraysPromise = null;
+    incidentMarkers = null;
+    incidentMarkersPromise = null;
+    incidentClusterer = null;
+    heatmap = null;
+    heatmapPromise = null;
+}
+
+function clearRoutePolylines() {
+    routePolylines.forEach(polyline => polyline.setMap(null));
+    routePolylines = [];
+}
+
+function initializeAutocomplete() {
+    const inputs = ['location', 'routeFrom', 'routeTo'];
+    
+    inputs.forEach(inputId => {
+        const input = document.getElementById(inputId);
+        if (!input) return;
+        
+        // Attach the Places widget only once a few characters are typed, so short prefixes never hit the API
+        const attachAutocomplete = () => {
+            if (autocompleteObjects[inputId] || input.value.trim().length < AUTOCOMPLETE_MIN_CHARS) return;
+            input.removeEventListener('input', attachAutocomplete);
+            
+            try {
+                const autocomplete = new google.maps.places.Autocomplete(input, {
+                    componentRestrictions: {country: 'us'},
+                    fields: ['place_id', 'formatted_address', 'geometry', 'name']
+                });
+                
+                autocompleteObjects[inputId] = autocomplete;
+                
+                autocomplete.addListener('place_changed', function() {
+                    const place = autocomplete.getPlace();
+                    if (place.geometry && inputId === 'location') {
+                        selectedLocation = place.geometry.location;
+                    }
+                });
+            } catch (error) {
+                console.error(`❌ Failed to setup autocomplete for ${inputId}:`, error);
+            }
+        };
+        
+        input.addEventListener('input', attachAutocomplete);
+        attachAutocomplete();
+    });
+}
+
+async function planSafeRoute() {
+    const from = document.getElementById('routeFrom').value;
+    const to = document.getElementById('routeTo').value;
+    const travelMode = document.getElementById('travelMode').value;
+    
+    if (!from || !to) {
+        alert('Please enter both start and end locations');
+        return;
+    }
+    
+    try {
+        const response = await fetch('/api/route', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ 
+                origin: from, 
+                destination: to,
+                travel_mode: travelMode
+            })
+        });
+        
+        const data = await response.json();
+        
+        if (response.ok) {
+            currentRoute = data;
+            currentRouteSegments = data.route_segments;
+            
+            await ensureMaps();
+            showRoute();
+            
+            document.getElementById('routeSafetyScore').textContent = data.safety_score;
+            document.getElementById('routeDuration').textContent = data.duration;
+            document.getElementById('routeDistance').textContent = data.distance;
+            document.getElementById('routeTravelMode').textContent = getTravelModeText(data.travel_mode);
+            document.getElementById('safePoints').textContent = data.safe_points;
+            document.getElementById('routeInfo').style.display = 'block';
+            
+            document.getElementById('clearRoute').style.display = 'block';
+            
+            console.log('✅ Route planned successfully');
+        } else {
+            alert('Error planning route: ' + data.error);
+        }
+    } catch (error) {
+        console.error('❌ Network error:', error);
+        alert('Network error. Please try again.');
+    }
+}
+
+function showRoute() {
+    clearRoutePolylines();
+    
+    if (currentRouteSegments && currentRouteSegments.length > 0) {
+        displayRouteWithIncidents(currentRouteSegments);
+    }
+}
+
+function displayRouteWithIncidents(routeSegments) {
+    // Decode each segment path once per route and reuse it on view toggles
+    if (!routeSegments.__decoded) {
+        const bounds = new google.maps.LatLngBounds();
+        routeSegments.__decoded = routeSegments.map(segment => {
+            const path = google.maps.geometry.encoding.decodePath(segment.encoded_path);
+            path.forEach(point => bounds.extend(point));
+            return path;
+        });
+        routeSegments.__bounds = bounds;
+        routeSegments.__boundsApplied = false;
+    }
+    
+    routeSegments.forEach((segment, index) => {
+        const pathCoordinates = routeSegments.__decoded[index];
+        
+        const style = SEGMENT_STYLES[segment.safety_level] || SEGMENT_STYLES._default;
+        
+        const routePolyline = new google.maps.Polyline({
+            path: pathCoordinates,
+            geodesic: true,
+            strokeColor: style.color,
+            strokeOpacity: 0.8,
+            strokeWeight: style.weight
+        });
+        
+        routePolyline.setMap(map);
+        routePolylines.push(routePolyline);
+        
+        routePolyline.addListener('click', (event) => {
+            if (!segmentInfoTemplate) {
+                segmentInfoTemplate = document.getElementById('segmentInfoTpl').content.firstElementChild;
+            }
+            if (!segmentInfoWindow) {
+                segmentInfoWindow = new google.maps.InfoWindow();
+            }
+            
+            const node = segmentInfoTemplate.cloneNode(true);
+            node.querySelector('.lvl').textContent = segment.safety_level.replace('_', ' ').toUpperCase();
+            node.querySelector('.cnt').textContent = segment.incident_count;
+            node.querySelector('.dst').textContent = segment.distance;
+            
+            segmentInfoWindow.setContent(node);
+            segmentInfoWindow.setPosition(event.latLng);
+            segmentInfoWindow.open(map);
+        });
+    });
+    
+    if (routeSegments.length > 0 && !routeSegments.__boundsApplied) {
+        map.fitBounds(routeSegments.__bounds);
+        routeSegments.__boundsApplied = true;
+    }
+}
+
+function getTravelModeText(mode) {
+    const modeTexts = {
+        'DRIVING': '🚗 Driving',
+        'WALKING': '🚶 Walking',
+        'TRANSIT': '🚌 Public Transit',
+        'BICYCLING': '🚲 Bicycling'
+    };
+    return modeTexts[mode] || mode;
+}
+
+function clearRoute() {
+    currentRoute = null;
+    currentRouteSegments = null;
+    clearRoutePolylines();
+    document.getElementById('routeInfo').style.display = 'none';
+    document.getElementById('clearRoute').style.display = 'none';
+    
+    document.getElementById('routeFrom').value = '';
+    document.getElementById('routeTo').value = '';
+}
+
+async function showIncidents() {
+    clearMarkers();
+    
+    console.log(`📍 Displaying ${incidents.length} incidents`);
+    
+    if (!incidentMarkersPromise) {
+        incidentMarkersPromise = buildIncidentMarkers();
+    }
+    const pending = incidentMarkersPromise;
+    const layer = await pending;
+    if (pending !== incidentMarkersPromise || (currentView !== 'incidents' && currentView !== 'all')) {
+        return;
+    }
+    
+    incidentMarkers = layer.markers;
+    incidentClusterer = layer.clusterer;
+    setIncidentsVisible(true);
+}
+
+async function buildIncidentMarkers() {
+    const { lat, lng, severity, type, incidents: list } = await getIncidentArrays();
+    
+    const built = new Array(lat.length);
+    for (let i = 0; i < lat.length; i++) {
+        const incident = list[i];
+        // Markers are handed to the clusterer instead of being added to the map one by one
+        const marker = new google.maps.Marker({
+            position: { lat: lat[i], lng: lng[i] },
+            icon: getMarkerIcon(SEVERITY_COLORS[severity[i]], INCIDENT_ICONS[type[i]])
+        });
+
+        marker.addListener('click', () => {
+            openMarkerInfoWindow(marker, buildIncidentContent(incident));
+        });
+        
+        built[i] = marker;
+    }
+    
+    return {
+        markers: built,
+        clusterer: window.markerClusterer ? new markerClusterer.MarkerClusterer({ markers: built }) : null
+    };
+}
+
+function svgTemplate(color, emoji, size, fontSize) {
+    const shape = MARKER_SHAPES[size];
+    const center = size / 2;
+    return `
+        <svg width="${size}" height="${size}" viewBox="0 0 ${size} ${size}" xmlns="http://www.w3.org/2000/svg">
+            <circle cx="${center}" cy="${center}" r="${shape.radius}" fill="${color}" stroke="white" stroke-width="${shape.stroke}"/>
+            <text x="${center}" y="${shape.textY}" text-anchor="middle" fill="white" font-size="${fontSize}">${emoji}</text>
+        </svg>
+    `;
+}
+
+function getMarkerIcon(color, emoji, size = 24, fontSize = 12) {
+    const key = `${color}|${emoji}|${size}|${fontSize}`;
+    if (!ICON_CACHE[key]) {
+        ICON_CACHE[key] = 'data:image/svg+xml;charset=UTF-8,' + encodeURIComponent(svgTemplate(color, emoji, size, fontSize));
+    }
+    if (!ICON_SIZES[size]) {
+        ICON_SIZES[size] = new google.maps.Size(size, size);
+    }
+    return { url: ICON_CACHE[key], scaledSize: ICON_SIZES[size] };
+}
+
+function buildIncidentContent(incident) {
+    const photoSrc = incident.photo_url || incident.photo_data;
+    const photoContent = incident.has_photo && photoSrc ? 
+        `<div style="margin: 10px 0;">
+            <img src="${photoSrc}" style="max-width: 100%; max-height: 150px; border-radius: 8px; box-shadow: 0 2px 4px rgba(0,0,0,0.1);" alt="Incident photo">
+            <div style="font-size: 0.8em; color: #666; margin-top: 5px;">📸 Photo attached</div>
+        </div>` : '';
+
+    return `
+        <div style="padding: 10px; min-width: 200px;">
+            <h3 style="margin: 0 0 10px 0; color: #333;">${getIncidentTypeLabel(incident)}</h3>
+            <p style="margin: 5px 0; color: #666;">${incident.description}</p>
+            ${photoContent}
+            <p style="margin: 5px 0; font-size: 0.9em; color: #888;">
+                <strong>Location:</strong> ${incident.location}<br>
+                <strong>Severity:</strong> ${incident.severity}<br>
+                <strong>Time:</strong> ${incident.timestamp}<br>
+                <strong>Source:</strong> <span style="color: #4CAF50;">${incident.source}</span>
+            </p>
+        </div>
+    `;
+}
+
+async function showHeatmap() {
+    if (currentView !== 'all') {
+        clearMarkers();
+    }
+    
+    if (!heatmapPromise) {
+        heatmapPromise = buildHeatmap();
+    }
+    const pending = heatmapPromise;
+    const layer = await pending;
+    if (pending !== heatmapPromise || (currentView !== 'heatmap' && currentView !== 'all')) {
+        return;
+    }
+    
+    heatmap = layer;
+    setHeatmapVisible(true);
+}
+
+async function buildHeatmap() {
+    const arrays = await getIncidentArrays();
+    
+    // Rasterize on the GPU with deck.gl when WebGL2 is available
+    if (supportsWebGL2()) {
+        try {
+            return buildDeckHeatmap(await loadDeckGl(), arrays);
+        } catch (error) {
+            console.error('❌ deck.gl heatmap unavailable, using the Maps heatmap:', error);
+        }
+    }
+    
+    const { lat, lng, severity } = arrays;
+    
+    // LatLng objects can only be built on the main thread
+    const heatmapData = new Array(lat.length);
+    for (let i = 0; i < lat.length; i++) {
+        heatmapData[i] = { location: new google.maps.LatLng(lat[i], lng[i]), weight: HEATMAP_WEIGHTS[severity[i]] };
+    }
+
+    return new google.maps.visualization.HeatmapLayer({
+        data: heatmapData,
+        dissipating: false,
+        radius: 50
+    });
+}
+
+async function toggleView(view) {
+    currentView = view;
+    
+    document.querySelectorAll('.control-btn').forEach(btn => btn.classList.remove('active'));
+    
+    let buttonId;
+    switch(view) {
+        case 'incidents':
+            buttonId = 'incidentView';
+            break;
+        case 'heatmap':
+            buttonId = 'heatmapView';
+            break;
+        case 'safety':
+            buttonId = 'safetyView';
+            break;
+        case 'all':
+            buttonId = 'allView';
+            break;
+    }
+    
+    document.getElementById(buttonId).classList.add('active');
+    
+    await ensureMaps();
+    
+    clearMarkers();
+    clearSafetyMarkers();
+    clearRoutePolylines();
+    
+    switch(view) {
+        case 'incidents':
+            await showIncidents();
+            break;
+        case 'heatmap':
+            await showHeatmap();
+            break;
+        case 'safety':
+            loadSafetyResources();
+            break;
+        case 'all':
+            await showIncidents();
+            await showHeatmap();
+            loadSafetyResources();
+            break;
+    }
+    
+    if (currentRoute && currentRouteSegments) {
+        showRoute();
+    }
+}
+
+function updateRecentIncidentsList() {
+    renderIncidentRows(incidents.slice(0, RECENT_INCIDENTS_LIMIT), document.getElementById('recentIncidentsList'));
+}
+
+// Latest row render per container, so a newer render stops older pending batches
+const rowRenderJobs = new WeakMap();
+
+function renderIncidentRows(list, container, batchSize = 20) {
+    // The first batch replaces the rows at once; the rest are appended one batch per animation frame
+    const job = {};
+    rowRenderJobs.set(container, job);
+    let i = 0;
+    function step() {
+        if (rowRenderJobs.get(container) !== job) return;
+        const fragment = document.createDocumentFragment();
+        for (let k = 0; k < batchSize && i < list.length; k++, i++) {
+            fragment.appendChild(buildIncidentRow(list[i]));
+        }
+        if (i <= batchSize) {
+            container.replaceChildren(fragment);
+        } else {
+            container.appendChild(fragment);
+        }
+        if (i < list.length) requestAnimationFrame(step);
+    }
+    step();
+}
+
+function buildIncidentRow(incident) {
+    const photoIndicator = incident.has_photo ? '📸 ' : '';
+    const item = document.createElement('div');
+    item.className = 'incident-item';
+    item.dataset.incidentId = incident.id;
+    item.append(
+        createTextDiv('incident-title', photoIndicator + getIncidentTypeLabel(incident)),
+        createTextDiv('incident-details', `${incident.location} • ${incident.timestamp}`),
+        createTextDiv('incident-source', `📊 ${incident.source}`)
+    );
+    return item;
+}
+
+function getIncidentTypeLabel(incident) {
+    // Capitalized once per incident and kept on the object
+    if (incident.typeLabel === undefined) {
+        incident.typeLabel = incident.type.charAt(0).toUpperCase() + incident.type.slice(1);
+    }
+    return incident.typeLabel;
+}
+
+function createTextDiv(className, text) {
+    const div = document.createElement('div');
+    div.className = className;
+    div.textContent = text;
+    return div;
+}
+
+async function highlightIncident(incidentId) {
+    const incident = incidentById.get(incidentId);
+    if (incident) {
+        await ensureMaps();
+        map.setCenter({ lat: incident.lat, lng: incident.lng });
+        map.setZoom(15);
+    }
+}
+
+// Google Maps is injected on demand rather than with a blocking script tag
+let mapsLoadPromise = null;
+
+function ensureMaps() {
+    if (!mapsLoadPromise) {
+        mapsLoadPromise = new Promise((resolve, reject) => {
+            window.onMapsLoaded = function() {
+                initMap();
+                resolve();
+            };
+            
+            const script = document.createElement('script');
+            script.src = `https://maps.googleapis.com/maps/api/js?key=${encodeURIComponent(window.SAFETYMAPPER_MAPS_KEY)}` +
+                '&libraries=places,visualization,geometry&callback=onMapsLoaded';
+            script.async = true;
+            script.onerror = () => {
+                mapsLoadPromise = null;
+                reject(new Error('Google Maps failed to load'));
+            };
+            document.head.appendChild(script);
+        });
+    }
+    return mapsLoadPromise;
+}
+
+function loadMapsWhenNeeded() {
+    // Load once the map scrolls into view, or as soon as an address field needs autocomplete
+    const mapElement = document.getElementById('map');
+    if ('IntersectionObserver' in window) {
+        const observer = new IntersectionObserver(entries => {
+            if (entries.some(entry => entry.isIntersecting)) {
+                observer.disconnect();
+                ensureMaps().catch(error => console.error('❌', error));
+            }
+        });
+        observer.observe(mapElement);
+    } else {
+        ensureMaps().catch(error => console.error('❌', error));
+    }
+    
+    ['location', 'routeFrom', 'routeTo'].forEach(inputId => {
+        document.getElementById(inputId).addEventListener('focus', () => {
+            ensureMaps().catch(error => console.error('❌', error));
+        }, { once: true });
+    });
+}
+
+// GPU heatmap: deck.gl is only fetched the first time the heatmap is shown
+const DECK_GL_URL = 'https://unpkg.com/deck.gl@8.9.36/dist.min.js';
+let deckLoadPromise = null;
+let webGL2Supported = null;
+
+function supportsWebGL2() {
+    if (webGL2Supported === null) {
+        try {
+            webGL2Supported = !!document.createElement('canvas').getContext('webgl2');
+        } catch (error) {
+            webGL2Supported = false;
+        }
+    }
+    return webGL2Supported;
+}
+
+function loadDeckGl() {
+    if (!deckLoadPromise) {
+        deckLoadPromise = new Promise((resolve, reject) => {
+            const script = document.createElement('script');
+            script.src = DECK_GL_URL;
+            script.async = true;
+            script.onload = () => resolve(window.deck);
+            script.onerror = () => {
+                deckLoadPromise = null;
+                reject(new Error('deck.gl failed to load'));
+            };
+            document.head.appendChild(script);
+        });
+    }
+    return deckLoadPromise;
+}
+
+function buildDeckHeatmap(deck, { lat, lng, severity }) {
+    // Binary attributes feed the typed incident arrays straight to the GPU
+    const positions = new Float32Array(lat.length * 2);
+    const weights = new Float32Array(lat.length);
+    for (let i = 0; i < lat.length; i++) {
+        positions[i * 2] = lng[i];
+        positions[i * 2 + 1] = lat[i];
+        weights[i] = HEATMAP_WEIGHTS[severity[i]];
+    }
+    
+    return new deck.GoogleMapsOverlay({
+        layers: [
+            new deck.HeatmapLayer({
+                id: 'incident-heatmap',
+                data: {
+                    length: lat.length,
+                    attributes: {
+                        getPosition: { value: positions, size: 2 },
+                        getWeight: { value: weights, size: 1 }
+                    }
+                },
+                radiusPixels: 40
+            })
+        ]
+    });
+}
+
+// Incident preprocessing: a structure of typed arrays, parallel to `incidents`, built off the main thread
+const SEVERITY_CODES = Object.freeze({ low: 0, medium: 1, high: 2 });
+const SEVERITY_UNKNOWN = 3;
+const SEVERITY_COLORS = ['#65a30d', '#ea580c', '#dc2626', '#6b7280'];
+const HEATMAP_WEIGHTS = [1, 2, 3, 1];
+const TYPE_CODES = Object.freeze({ theft: 0, assault: 1, harassment: 2, vandalism: 3, suspicious: 4 });
+const TYPE_UNKNOWN = 5;
+const INCIDENT_ICONS = ['🔓', '⚠️', '🚫', '💥', '👀', '❓'];
+let incidentWorker = null;
+let incidentArraysPromise = null;
+// Pending worker builds by request id; a reset can start a new build before the old reply arrives
+const incidentRequests = new Map();
+let nextIncidentRequestId = 0;
+
+function buildIncidentArrays(list) {
+    const lat = new Float32Array(list.length);
+    const lng = new Float32Array(list.length);
+    const severity = new Uint8Array(list.length);
+    const type = new Uint8Array(list.length);
+    for (let i = 0; i < list.length; i++) {
+        lat[i] = list[i].lat;
+        lng[i] = list[i].lng;
+        severity[i] = SEVERITY_CODES[list[i].severity] ?? SEVERITY_UNKNOWN;
+        type[i] = TYPE_CODES[list[i].type] ?? TYPE_UNKNOWN;
+    }
+    return { lat, lng, severity, type };
+}
+
+function incidentWorkerMain() {
+    self.onmessage = function(e) {
+        const arrays = buildIncidentArrays(e.data.incidents);
+        self.postMessage({ id: e.data.id, arrays: arrays },
+            [arrays.lat.buffer, arrays.lng.buffer, arrays.severity.buffer, arrays.type.buffer]);
+    };
+}
+
+function getIncidentWorker() {
+    if (!incidentWorker) {
+        const source = `const SEVERITY_CODES = ${JSON.stringify(SEVERITY_CODES)};` +
+            `const SEVERITY_UNKNOWN = ${SEVERITY_UNKNOWN};` +
+            `const TYPE_CODES = ${JSON.stringify(TYPE_CODES)};` +
+            `const TYPE_UNKNOWN = ${TYPE_UNKNOWN};` +
+            buildIncidentArrays.toString() + ';(' + incidentWorkerMain.toString() + ')();';
+        const url = URL.createObjectURL(new Blob([source], { type: 'text/javascript' }));
+        incidentWorker = new Worker(url);
+        URL.revokeObjectURL(url);
+        incidentWorker.onmessage = (e) => {
+            const request = incidentRequests.get(e.data.id);
+            if (!request) return;
+            incidentRequests.delete(e.data.id);
+            request.resolve({ ...e.data.arrays, incidents: request.list });
+        };
+        incidentWorker.onerror = () => {
+            for (const request of incidentRequests.values()) {
+                request.resolve({ ...buildIncidentArrays(request.list), incidents: request.list });
+            }
+            incidentRequests.clear();
+        };
+    }
+    return incidentWorker;
+}
+
+function getIncidentArrays() {
+    if (!incidentArraysPromise) {
+        // The arrays are parallel to this snapshot, which is returned with them as `incidents`
+        const list = incidents.slice();
+        if (typeof Worker === 'undefined') {
+            incidentArraysPromise = Promise.resolve({ ...buildIncidentArrays(list), incidents: list });
+        } else {
+            incidentArraysPromise = new Promise(resolve => {
+                const id = ++nextIncidentRequestId;
+                incidentRequests.set(id, { list: list, resolve: resolve });
+                getIncidentWorker().postMessage({
+                    id: id,
+                    incidents: list.map(({ lat, lng, severity, type }) => ({ lat, lng, severity, type }))
+                });
+            });
+        }
+    }
+    return incidentArraysPromise;
+}
+
+// Photo compression: decode and resize off the main thread when possible
+const PHOTO_MAX_SIZE = 800;
+const PHOTO_QUALITY = 0.7;
+let photoWorker = null;
+let photoWorkerFailed = false;
+// In-flight worker compressions by request id, so overlapping picks each get their own reply
+const photoRequests = new Map();
+let nextPhotoRequestId = 0;
+
+function fitPhotoDimensions(width, height, maxSize) {
+    if (width > height) {
+        if (width > maxSize) {
+            height = (height * maxSize) / width;
+            width = maxSize;
+        }
+    } else {
+        if (height > maxSize) {
+            width = (width * maxSize) / height;
+            height = maxSize;
+        }
+    }
+    return { width: Math.round(width), height: Math.round(height) };
+}
+
+function photoWorkerMain() {
+    self.onmessage = async function(e) {
+        const id = e.data.id;
+        try {
+            const bitmap = await createImageBitmap(e.data.file);
+            const { width, height } = fitPhotoDimensions(bitmap.width, bitmap.height, e.data.maxSize);
+            const canvas = new OffscreenCanvas(width, height);
+            canvas.getContext('2d').drawImage(bitmap, 0, 0, width, height);
+            bitmap.close();
+            const blob = await canvas.convertToBlob({ type: 'image/jpeg', quality: e.data.quality });
+            self.postMessage({ id: id, blob: blob });
+        } catch (error) {
+            self.postMessage({ id: id, error: String(error) });
+        }
+    };
+}
+
+function compressPendingPhotosOnMainThread() {
+    for (const request of photoRequests.values()) {
+        compressPhotoOnMainThread(request.file).then(request.resolve, request.reject);
+    }
+    photoRequests.clear();
+}
+
+function getPhotoWorker() {
+    if (!photoWorker) {
+        const source = fitPhotoDimensions.toString() + ';(' + photoWorkerMain.toString() + ')();';
+        const url = URL.createObjectURL(new Blob([source], { type: 'text/javascript' }));
+        try {
+            photoWorker = new Worker(url);
+        } finally {
+            URL.revokeObjectURL(url);
+        }
+        photoWorker.onmessage = (e) => {
+            const request = photoRequests.get(e.data.id);
+            if (!request) return;
+            photoRequests.delete(e.data.id);
+            if (e.data.error) {
+                // e.g. no OffscreenCanvas JPEG encoder in this browser - the canvas path still works
+                compressPhotoOnMainThread(request.file).then(request.resolve, request.reject);
+            } else {
+                request.resolve(e.data.blob);
+            }
+        };
+        photoWorker.onerror = () => {
+            // Worker failed to load (e.g. CSP blocks blob: workers) - stop using it and finish here
+            console.warn('⚠️ Photo worker unavailable, compressing on the main thread');
+            photoWorkerFailed = true;
+            photoWorker.terminate();
+            photoWorker = null;
+            compressPendingPhotosOnMainThread();
+        };
+    }
+    return photoWorker;
+}
+
+function compressPhoto(file) {
+    if (photoWorkerFailed || typeof Worker === 'undefined' ||
+        typeof OffscreenCanvas === 'undefined' || typeof createImageBitmap === 'undefined') {
+        return compressPhotoOnMainThread(file);
+    }
+    
+    let worker;
+    try {
+        worker = getPhotoWorker();
+    } catch (error) {
+        photoWorkerFailed = true;
+        return compressPhotoOnMainThread(file);
+    }
+    
+    return new Promise((resolve, reject) => {
+        const id = ++nextPhotoRequestId;
+        photoRequests.set(id, { file: file, resolve: resolve, reject: reject });
+        worker.postMessage({ id: id, file: file, maxSize: PHOTO_MAX_SIZE, quality: PHOTO_QUALITY });
+    });
+}
+
+async function compressPhotoOnMainThread(file) {
+    // Decode the File directly; no base64 data URL round trip
+    const source = typeof createImageBitmap !== 'undefined'
+        ? await createImageBitmap(file)
+        : await loadImageFromBlob(file);
+    
+    const { width, height } = fitPhotoDimensions(source.width, source.height, PHOTO_MAX_SIZE);
+    const canvas = document.createElement('canvas');
+    canvas.width = width;
+    canvas.height = height;
+    canvas.getContext('2d').drawImage(source, 0, 0, width, height);
+    if (source.close) {
+        source.close();
+    }
+    
+    return new Promise((resolve, reject) => {
+        canvas.toBlob(blob => blob ? resolve(blob) : reject(new Error('Compression failed')),
+                      'image/jpeg', PHOTO_QUALITY);
+    });
+}
+
+function loadImageFromBlob(blob) {
+    return new Promise((resolve, reject) => {
+        const url = URL.createObjectURL(blob);
+        const img = new Image();
+        img.onload = () => {
+            URL.revokeObjectURL(url);
+            resolve(img);
+        };
+        img.onerror = () => {
+            URL.revokeObjectURL(url);
+            reject(new Error('Invalid image'));
+        };
+        img.src = url;
+    });
+}
+
+function clearPhotoPreview() {
+    const preview = document.getElementById('previewImage');
+    if (preview.src.startsWith('blob:')) {
+        URL.revokeObjectURL(preview.src);
+    }
+    preview.removeAttribute('src');
+    document.getElementById('photoPreview').style.display = 'none';
+}
+
+// Initialize chat when page loads
+document.addEventListener('DOMContentLoaded', function() {
+    initializeChat();
+    loadMapsWhenNeeded();
+    
+    const chatInput = document.getElementById('chatInput');
+    if (chatInput) {
+        chatInput.addEventListener('keypress', handleChatKeyPress);
+    }
+    
+    const sendButton = document.getElementById('chatSend');
+    if (sendButton) {
+        sendButton.addEventListener('click', sendChatMessage);
+    }
+    
+    setTimeout(() => {
+        const badge = document.getElementById('chatBadge');
+        if (badge && badge.style.display !== 'none') {
+            badge.style.display = 'none';
+        }
+    }, 10000);
+});
+
+// Incident form handling
+document.addEventListener('DOMContentLoaded', function() {
+    document.getElementById('recentIncidentsList').addEventListener('click', function(e) {
+        const item = e.target.closest('[data-incident-id]');
+        if (item) {
+            highlightIncident(item.dataset.incidentId);
+        }
+    });
+
+    const incidentTypes = document.getElementById('incidentTypesContainer');
+    incidentTypes.addEventListener('click', function(e) {
+        const type = e.target.closest('.incident-type');
+        if (!type) return;
+        incidentTypes.querySelector('.selected')?.classList.remove('selected');
+        type.classList.add('selected');
+        selectedIncidentType = type.dataset.type;
+    });
+
+    // Photo upload handling
+    document.getElementById('photoUpload').addEventListener('change', async function(e) {
+        const file = e.target.files[0];
+        if (file) {
+            if (file.size > 2 * 1024 * 1024) { // 2MB limit
+                alert('Photo size must be less than 2MB');
+                this.value = '';
+                return;
+            }
+            
+            try {
+                const blob = await compressPhoto(file);
+                // A later pick may have finished first; keep only the current file's result
+                if (this.files[0] !== file) return;
+                
+                clearPhotoPreview();
+                selectedPhoto = {
+                    blob: blob,
+                    filename: file.name,
+                    size: blob.size,
+                    type: 'image/jpeg'
+                };
+                
+                document.getElementById('previewImage').src = URL.createObjectURL(blob);
+                document.getElementById('photoPreview').style.display = 'block';
+            } catch (error) {
+                console.error('❌ Photo processing failed:', error);
+                alert('Could not process photo. Please try another image.');
+                this.value = '';
+            }
+        }
+    });
+
+    document.getElementById('removePhoto').addEventListener('click', function() {
+        clearPhotoPreview();
+        selectedPhoto = null;
+        document.getElementById('photoUpload').value = '';
+    });
+
+    document.getElementById('incidentForm').addEventListener('submit', async function(e) {
+        e.preventDefault();
+        
+        if (!selectedIncidentType) {
+            alert('Please select an incident type');
+            return;
+        }
+        
+        const location = document.getElementById('location').value;
+        if (!location) {
+            alert('Please enter a location');
+            return;
+        }
+        
+        const description = document.getElementById('description').value;
+        const severity = document.getElementById('severity').value;
+        
+        // Show loading state
+        const submitBtn = this.querySelector('button[type="submit"]');
+        const originalText = submitBtn.textContent;
+        submitBtn.textContent = 'Saving...';
+        submitBtn.disabled = true;
+        
+        try {
+            // Multipart upload sends the JPEG bytes as-is instead of a base64 data URL
+            const formData = new FormData();
+            formData.append('type', selectedIncidentType);
+            formData.append('location', location);
+            formData.append('description', description);
+            formData.append('severity', severity);
+            if (selectedPhoto) {
+                formData.append('photo', selectedPhoto.blob, selectedPhoto.filename);
+            }
+            
+            const response = await fetch('/api/incidents', {
+                method: 'POST',
+                body: formData
+            });
+            
+            const data = await response.json();
+            
+            if (response.ok) {
+                console.log('✅ Incident saved!');
+                
+                incidents.unshift(data);
+                incidentById.set(data.id, data);
+                resetIncidentLayers();
+                
+                const successDiv = document.getElementById('successMessage');
+                const photoMessage = selectedPhoto ? ' (with photo)' : '';
+                const form = this;
+                
+                selectedIncidentType = '';
+                selectedLocation = null;
+                selectedPhoto = null;
+                clearClickMarker();
+                
+                // Apply all of the form's DOM updates together in the next frame
+                requestAnimationFrame(() => {
+                    successDiv.firstElementChild.textContent =
+                        `✅ Incident reported successfully${photoMessage}! Thank you for helping keep our community safe.`;
+                    successDiv.style.display = 'block';
+                    form.reset();
+                    clearPhotoPreview();
+                    document.querySelector('#incidentTypesContainer .selected')?.classList.remove('selected');
+                    updateRecentIncidentsList();
+                });
+                
+                if (map && (currentView === 'incidents' || currentView === 'all')) {
+                    showIncidents();
+                }
+                if (map && (currentView === 'heatmap' || currentView === 'all')) {
+                    showHeatmap();
+                }
+                
+                setTimeout(() => {
+                    successDiv.style.display = 'none';
+                }, 5000);
+            } else {
+                console.error('❌ Error saving:', data.error);
+                let errorMessage = 'Error: ' + data.error;
+                if (response.status === 413) {
+                    errorMessage = 'Photo is too large to upload. Please choose a smaller photo.';
+                }
+                alert(errorMessage);
+            }
+        } catch (error) {
+            console.error('❌ Network error:', error);
+            alert('Network error. Please try again.');
+        } finally {
+            // Restore button state
+            submitBtn.textContent = originalText;
+            submitBtn.disabled = false;
+        }
+    });
+});
+
+function showAbout() {
+    alert(`🛡️ SafetyMapper - Community Safety Platform
+
+SafetyMapper helps communities stay safe through:
+
+✅ Real-time incident reporting with Google Firestore storage
+✅ Live police stations and hospitals display  
+✅ AI Safety Assistant powered by Google Gemini with Vertex AI Safety
+✅ Advanced content filtering for safe interactions
+✅ Interactive safety mapping with multiple view modes
+✅ Professional chat interface with guardrails
+
+🤖 AI-Powered Chat Features:
+• Natural language safety queries
+• Multi-layered content moderation
+• Personalized safety recommendations
+• Contextual safety advice
+• Professional floating chat interface
+
+🔥 Powered by Google Cloud technologies for enterprise-grade safety and security.
+
+Together, we can make our neighborhoods safer! 🌟`);
+}
+
+function showHelp() {
+    alert(`🆘 How to use SafetyMapper:
+
+📝 REPORT INCIDENTS:
+• Select incident type and location
+• All reports automatically saved to Firestore
+• Real-time updates across users
+
+🗺️ VIEW MODES:
+• 📍 Incidents: See incident markers on map
+• 🔥 Heatmap: Visualize incident density  
+• 🚔 Safety Resources: See police stations & hospitals
+• 🌟 All Data: Combined view with all information
+
+🤖 AI SAFETY ASSISTANT:
+• Click the floating "🤖" button (bottom-right corner)
+• Ask natural language questions about safety
+• Get intelligent responses with local data analysis
+• Advanced content filtering ensures safe interactions
+• Mobile-optimized for all devices
+
+💡 All data is stored securely in Google Cloud Firestore!
+🛡️ Content is filtered using Vertex AI Safety for protection!`);
+}
+
+// Global functions
+window.toggleChat = toggleChat;
+window.sendChatMessage = sendChatMessage;
+window.handleChatKeyPress = handleChatKeyPress;